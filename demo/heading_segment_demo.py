@@ -5,23 +5,48 @@ Gradio Demo 应用 - Markdown 文档切分测试
 支持切换展示 JSON 或渲染回 Markdown
 """
 
-import json
+import os
 import re
 import sys
+import tempfile
 import time
+import traceback
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
+from string import Formatter
 
 import gradio as gr
+import orjson
+from markdown_it import MarkdownIt
+from markdown_it.common.utils import escapeHtml
 
 # Add parent directory to path to import services module
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from services.heading_segment import ChunkType, HeadingSegmenter
+from services.heading_segment import ChunkType, HeadingSegmenter, clear_split_cache
 
 # 配置常量
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+HARD_FILE_SIZE_LIMIT = 50 * 1024 * 1024  # 50MB，超过则直接拒绝，不读入内存
+DEBUG = bool(os.environ.get("SEGMENTER_DEBUG"))  # 调试模式下在 JSON 中返回 traceback
 MAX_PREVIEW_CHUNKS = 500  # 最多显示500个分块的详细信息
 
+# 没有父级时显示的占位（以单元素元组形式，便于与 pids 统一取末尾元素）
+_NO_PARENT = ("无",)
+
+# 完整 JSON 下载文件写入进程级临时目录，进程退出时整体删除
+_DOWNLOAD_DIR = tempfile.TemporaryDirectory(prefix="segmenter_downloads_")
+# Gradio 会把返回的文件复制到自己的缓存，本地副本超过该时长即清理
+_DOWNLOAD_TTL_SECONDS = 600
+# Gradio 缓存中的上传/下载副本：每小时检查一次，删除超过一小时的文件
+_GRADIO_DELETE_CACHE = (3600, 3600)
+
+# 后台写下载文件的线程池：orjson 序列化持有 GIL，只有磁盘写入能与 HTML 渲染并行
+_FILE_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="json-file")
+
 # 分块类型对应的颜色配置（较浅的背景色，适合文本渲染）
 CHUNK_COLORS = {
     ChunkType.TEXT: {
@@ -75,29 +100,88 @@ CHUNK_COLORS = {
 }
 
 
+_JSON_OPTIONS = orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+
+
+def dump_json(data) -> str:
+    """序列化为缩进 2 格的 JSON 字符串"""
+    return orjson.dumps(data, option=_JSON_OPTIONS).decode("utf-8")
+
+
+def _prune_download_dir() -> None:
+    """删除下载目录中已过期的 JSON 文件"""
+    cutoff = time.time() - _DOWNLOAD_TTL_SECONDS
+    for path in Path(_DOWNLOAD_DIR.name).glob("chunks_*.json"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            pass
+
+
+def write_json_file(payload: bytes) -> str:
+    """将已序列化的 JSON 写入下载目录（供下载），返回文件路径"""
+    _prune_download_dir()
+    with tempfile.NamedTemporaryFile(
+        "wb", prefix="chunks_", suffix=".json", dir=_DOWNLOAD_DIR.name, delete=False
+    ) as f:
+        f.write(payload)
+    return f.name
+
+
+def serialize_chunks(summary: dict, chunks: list) -> tuple[str, bytes | None]:
+    """生成页面展示的 JSON 及（分块过多时）待写入下载文件的完整 JSON"""
+    if len(chunks) > MAX_PREVIEW_CHUNKS:
+        # 分块过多时页面只返回前 MAX_PREVIEW_CHUNKS 个，完整结果写入文件供下载
+        json_output = dump_json(
+            {
+                "summary": summary,
+                "chunks": chunks[:MAX_PREVIEW_CHUNKS],
+                "truncated": True,
+            }
+        )
+        full_json = orjson.dumps(
+            {"summary": summary, "chunks": chunks}, option=_JSON_OPTIONS
+        )
+        return json_output, full_json
+    return dump_json({"summary": summary, "chunks": chunks}), None
+
+
+# 分块类型对应的图标
+CHUNK_TYPE_ICONS = {
+    ChunkType.TEXT: "📝",
+    ChunkType.IMAGE: "🖼️",
+    ChunkType.TABLE: "📊",
+    ChunkType.CODE: "💻",
+    ChunkType.HEADER: "📌",
+    ChunkType.HTML_IMAGE: "🖼️",
+    ChunkType.HTML_TABLE: "📊",
+    ChunkType.HTML_CODE: "💻",
+}
+
+# 分块类型标识（模块加载时生成）
+_TYPE_LABELS = {
+    chunk_type: f"{icon} {chunk_type.upper()}"
+    for chunk_type, icon in CHUNK_TYPE_ICONS.items()
+}
+
+
 def format_chunk_type(chunk_type: str) -> str:
     """为不同的分块类型添加标识"""
-    type_icons = {
-        ChunkType.TEXT: "📝",
-        ChunkType.IMAGE: "🖼️",
-        ChunkType.TABLE: "📊",
-        ChunkType.CODE: "💻",
-        ChunkType.HEADER: "📌",
-        ChunkType.HTML_IMAGE: "🖼️",
-        ChunkType.HTML_TABLE: "📊",
-        ChunkType.HTML_CODE: "💻",
-    }
-    icon = type_icons.get(chunk_type, "📄")
-    return f"{icon} {chunk_type.upper()}"
+    label = _TYPE_LABELS.get(chunk_type)
+    if label is None:
+        label = f"📄 {chunk_type.upper()}"
+    return label
+
+
+_SIZE_UNITS = ("B", "KB", "MB", "GB", "TB")
 
 
 def format_file_size(size_bytes: int) -> str:
     """格式化文件大小"""
-    for unit in ["B", "KB", "MB", "GB"]:
-        if size_bytes < 1024:
-            return f"{size_bytes:.2f} {unit}"
-        size_bytes /= 1024
-    return f"{size_bytes:.2f} TB"
+    # 1024 = 2**10，由二进制位数直接得到单位下标
+    unit_index = min(len(_SIZE_UNITS) - 1, max(size_bytes.bit_length() - 1, 0) // 10)
+    return f"{size_bytes / (1 << (10 * unit_index)):.2f} {_SIZE_UNITS[unit_index]}"
 
 
 def get_chunk_style(chunk_type: str) -> dict:
@@ -108,74 +192,186 @@ def get_chunk_style(chunk_type: str) -> dict:
     )
 
 
+def _build_chunk_template(style: dict) -> str:
+    """按分块类型的颜色预先生成分块 HTML 模板，仅保留动态字段占位符"""
+    # 分块标签信息
+    chunk_info = f"""
+            <div style="
+                display: flex;
+                align-items: center;
+                gap: 8px;
+                padding: 6px 12px;
+                background: {style["bg"]};
+                border: 1px solid {style["border"]};
+                border-radius: 6px 6px 0 0;
+                border-bottom: none;
+                font-size: 11px;
+                color: {style["text"]};
+                font-weight: 500;
+            ">
+                <span style="background: {style["border"]}; color: white; padding: 2px 8px; border-radius: 8px; font-weight: bold;">
+                    #{{id}}
+                </span>
+                <span>{{type_label}}</span>
+                <span style="opacity: 0.7;">|</span>
+                <span>层级: {{level}}</span>
+                <span style="opacity: 0.7;">|</span>
+                <span>父级: {{parent}}</span>
+            </div>
+            """
+
+    # 分块容器
+    return f"""
+            <div style="
+                margin-bottom: 20px;
+                border: 2px solid {style["border"]};
+                border-radius: 0 6px 6px 6px;
+                overflow: hidden;
+                background: white;
+                transition: all 0.2s ease;
+                box-shadow: 0 1px 3px rgba(0,0,0,0.05);
+            " onmouseover="this.style.boxShadow='0 4px 8px rgba(0,0,0,0.1)'; this.style.borderColor='{style["hover"]}'"
+               onmouseout="this.style.boxShadow='0 1px 3px rgba(0,0,0,0.05)'; this.style.borderColor='{style["border"]}'">
+                {chunk_info}
+                <div style="
+                    padding: 16px;
+                    background: {style["bg"]};
+                    border-top: 1px solid {style["border"]};
+                    line-height: 1.8;
+                    color: #333;
+                ">
+                    {{content_html}}
+                </div>
+            </div>
+            """
+
+
+def _build_chunk_fragments(style: dict) -> tuple[str, ...]:
+    """将分块模板按占位符切成静态片段，依次夹在 id、类型、层级、父级、内容之间"""
+    template = _build_chunk_template(style)
+    return tuple(literal for literal, _, _, _ in Formatter().parse(template))
+
+
+# 各分块类型的 HTML 静态片段（颜色在模块加载时填好）
+_CHUNK_FRAGMENTS = {
+    chunk_type: _build_chunk_fragments(style)
+    for chunk_type, style in CHUNK_COLORS.items()
+}
+
+
+def _build_type_badge_template(chunk_type: str, style: dict) -> str:
+    """预先生成分块类型统计徽标，仅保留数量占位符"""
+    return f"""
+            <span style="background: {style["bg"]}; border: 1px solid {style["border"]}; padding: 4px 12px; border-radius: 15px; margin-right: 8px; font-size: 12px; color: {style["text"]}; font-weight: bold;">
+                {format_chunk_type(chunk_type)}: {{count}}
+            </span>
+            """
+
+
+# 各分块类型的统计徽标模板
+_TYPE_BADGE_TEMPLATES = {
+    chunk_type: _build_type_badge_template(chunk_type, style)
+    for chunk_type, style in CHUNK_COLORS.items()
+}
+
+# 颜色图例（只依赖静态的 CHUNK_COLORS）
+COLOR_LEGEND_HTML = "".join(
+    f"""
+                <div class="color-legend-item" style="background: {style["bg"]}; border: 1px solid {style["border"]}; color: {style["text"]};">
+                    <div class="color-box" style="background: {style["bg"]}; border-color: {style["border"]};"></div>
+                    <span style="font-weight: 500;">{format_chunk_type(chunk_type)}</span>
+                </div>
+                """
+    for chunk_type, style in CHUNK_COLORS.items()
+)
+
+
+_HTML_ESCAPE_TABLE = str.maketrans(
+    {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"}
+)
+
+
 def escape_html(text: str) -> str:
     """转义 HTML 特殊字符"""
-    return (
-        text.replace("&", "&amp;")
-        .replace("<", "&lt;")
-        .replace(">", "&gt;")
-        .replace('"', "&quot;")
-        .replace("'", "&#39;")
-    )
+    # 单次 translate 代替逐字符的多次 replace
+    return text.translate(_HTML_ESCAPE_TABLE)
 
 
-def markdown_to_html_preview(markdown_text: str) -> str:
-    """简单的 Markdown 转 HTML 预览（用于显示分块内容）"""
-    # 基本的 Markdown 转换
-    html = markdown_text
-
-    # 转义 HTML 特殊字符
-    html = escape_html(html)
-
-    # 转换标题
-    html = re.sub(r"^######\s+(.+)$", r"<h6>\1</h6>", html, flags=re.MULTILINE)
-    html = re.sub(r"^#####\s+(.+)$", r"<h5>\1</h5>", html, flags=re.MULTILINE)
-    html = re.sub(r"^####\s+(.+)$", r"<h4>\1</h4>", html, flags=re.MULTILINE)
-    html = re.sub(r"^###\s+(.+)$", r"<h3>\1</h3>", html, flags=re.MULTILINE)
-    html = re.sub(r"^##\s+(.+)$", r"<h2>\1</h2>", html, flags=re.MULTILINE)
-    html = re.sub(r"^#\s+(.+)$", r"<h1>\1</h1>", html, flags=re.MULTILINE)
-
-    # 转换粗体和斜体
-    html = re.sub(r"\*\*\*(.+?)\*\*\*", r"<strong><em>\1</em></strong>", html)
-    html = re.sub(r"\*\*(.+?)\*\*", r"<strong>\1</strong>", html)
-    html = re.sub(r"\*(.+?)\*", r"<em>\1</em>", html)
-    html = re.sub(r"___(.+?)___", r"<strong><em>\1</em></strong>", html)
-    html = re.sub(r"__(.+?)__", r"<strong>\1</strong>", html)
-    html = re.sub(r"_(.+?)_", r"<em>\1</em>", html)
-
-    # 转换行内代码
-    html = re.sub(
-        r"`(.+?)`",
-        r'<code style="background: rgba(0,0,0,0.05); padding: 2px 6px; border-radius: 3px; font-family: monospace;">\1</code>',
-        html,
-    )
+_PRE_STYLE = "background: #f8f9fa; padding: 12px; border-radius: 5px; overflow-x: auto;"
+_INLINE_CODE_STYLE = (
+    "background: rgba(0,0,0,0.05); padding: 2px 6px; border-radius: 3px; "
+    "font-family: monospace;"
+)
 
-    # 转换代码块
-    html = re.sub(
-        r"```(\w+)?\n(.*?)```",
-        r'<pre style="background: #f8f9fa; padding: 12px; border-radius: 5px; overflow-x: auto;"><code>\2</code></pre>',
-        html,
-        flags=re.DOTALL,
-    )
 
-    # 转换链接
-    html = re.sub(
-        r"\[([^\]]+)\]\(([^)]+)\)",
-        r'<a href="\2" target="_blank" style="color: #1976d2;">\1</a>',
-        html,
-    )
+def _render_code_block(self, tokens, idx, options, env) -> str:
+    """代码块（围栏/缩进）渲染为带背景的 pre"""
+    content = escapeHtml(tokens[idx].content)
+    return f'<pre style="{_PRE_STYLE}"><code>{content}</code></pre>\n'
+
+
+def _render_code_inline(self, tokens, idx, options, env) -> str:
+    content = escapeHtml(tokens[idx].content)
+    return f'<code style="{_INLINE_CODE_STYLE}">{content}</code>'
+
+
+def _render_link_open(self, tokens, idx, options, env) -> str:
+    token = tokens[idx]
+    token.attrSet("target", "_blank")
+    token.attrSet("style", "color: #1976d2;")
+    return self.renderToken(tokens, idx, options, env)
+
+
+def _render_image(self, tokens, idx, options, env) -> str:
+    tokens[idx].attrSet("style", "max-width: 100%; height: auto;")
+    return self.image(tokens, idx, options, env)
 
-    # 转换图片
-    html = re.sub(
-        r"!\[([^\]]*)\]\(([^)]+)\)",
-        r'<img src="\2" alt="\1" style="max-width: 100%; height: auto;" />',
-        html,
-    )
 
-    # 转换换行
-    html = html.replace("\n", "<br>")
+# 预览渲染器：首次渲染时才创建，避免拖慢模块导入
+_PREVIEW_MD: MarkdownIt | None = None
 
-    return html
+
+def _get_preview_md() -> MarkdownIt:
+    """获取（必要时创建）分块预览使用的 Markdown 渲染器"""
+    global _PREVIEW_MD
+    if _PREVIEW_MD is None:
+        md = MarkdownIt("commonmark", {"html": False, "breaks": True}).disable(
+            "linkify"
+        )
+        md.add_render_rule("fence", _render_code_block)
+        md.add_render_rule("code_block", _render_code_block)
+        md.add_render_rule("code_inline", _render_code_inline)
+        md.add_render_rule("link_open", _render_link_open)
+        md.add_render_rule("image", _render_image)
+        _PREVIEW_MD = md
+    return _PREVIEW_MD
+
+
+# 不含任何 Markdown 语法的纯文本行：以字母开头，仅含字母、数字、空格与常见标点，行尾无空格
+_PLAIN_LINE = r"[^\W\d_](?:[^\W_]|[ ,.;:?!'\"，。、；：？！“”‘’（）()])*(?<! )"
+_PLAIN_TEXT_RE = re.compile(rf"{_PLAIN_LINE}(?:\n{_PLAIN_LINE})*")
+
+
+@lru_cache(maxsize=4096)
+def markdown_to_html_preview(markdown_text: str) -> str:
+    """Markdown 转 HTML 预览（用于显示分块内容）"""
+    # 纯文本无需解析，直接生成与渲染器输出一致的段落（软换行即 <br />）
+    if _PLAIN_TEXT_RE.fullmatch(markdown_text):
+        return "<p>" + escapeHtml(markdown_text).replace("\n", "<br />\n") + "</p>\n"
+    # 使用 CommonMark 解析器渲染，原始 HTML 会被转义
+    return _get_preview_md().render(markdown_text)
+
+
+def _error_outputs(
+    error_msg: str, error_payload: dict | None = None
+) -> tuple[str, str, str, None]:
+    """生成出错时界面四个输出（原文、JSON、HTML、下载文件）"""
+    return (
+        f"读取文件失败: {error_msg}",
+        dump_json(error_payload or {"error": error_msg}),
+        f'<div style="color: #d32f2f; padding: 20px; background: #ffebee; border-radius: 5px; border-left: 4px solid #d32f2f;">{escape_html(error_msg)}</div>',
+        None,
+    )
 
 
 def split_markdown_formatted(
@@ -183,26 +379,32 @@ def split_markdown_formatted(
     max_segment_length: int = 500,
     heading_level_limit: int = 6,
     progress=gr.Progress(),
-) -> tuple[str, str, str]:
+) -> tuple[str, str, str, str | None]:
     """
-    处理上传的 md 文件，返回原文档、JSON 格式和 Markdown 渲染
+    处理上传的 md 文件，返回原文档、JSON 格式、Markdown 渲染和完整 JSON 下载文件
 
     :param file: 上传的文件
     :param max_segment_length: 文本分块最大长度
     :param heading_level_limit: 标题切分等级限制（1-6）
     """
     if file is None:
-        return "请选择一个 Markdown 文件", "", "等待上传文件..."
+        return "请选择一个 Markdown 文件", "", "等待上传文件...", None
 
     try:
         # 第一步：读取文件并检查大小
         progress(0.1, desc="正在读取文件...")
-        file_size = file.size if hasattr(file, "size") else 0
-
-        with open(file.name, "r", encoding="utf-8") as f:
-            md_content = f.read()
+        # 直接取磁盘上的文件大小，避免为计算大小再编码一遍全文
+        actual_size = os.path.getsize(file.name)
+
+        # 超过硬上限的文件在读取前直接拒绝
+        if actual_size > HARD_FILE_SIZE_LIMIT:
+            error_msg = (
+                f"文件大小 {format_file_size(actual_size)} 超过上限 "
+                f"{format_file_size(HARD_FILE_SIZE_LIMIT)}，已拒绝处理"
+            )
+            return _error_outputs(error_msg)
 
-        actual_size = len(md_content.encode("utf-8"))
+        md_content = Path(file.name).read_text(encoding="utf-8")
 
         # 文件过大警告
         if actual_size > MAX_FILE_SIZE:
@@ -228,25 +430,25 @@ def split_markdown_formatted(
         if not chunks:
             return (
                 md_content + warning,
-                json.dumps(
-                    {"error": "未检测到任何内容分块"}, ensure_ascii=False, indent=2
-                ),
+                dump_json({"error": "未检测到任何内容分块"}),
                 "未检测到任何内容分块",
+                None,
             )
 
         progress(0.5, desc="正在生成 JSON 结果...")
 
         # 第三步：JSON 格式结果
-        json_result = {
-            "summary": {
-                "total_chunks": len(chunks),
-                "max_segment_length": max_segment_length,
-                "parse_time_seconds": round(parse_time, 2),
-                "file_size": format_file_size(actual_size),
-            },
-            "chunks": chunks,
+        summary = {
+            "total_chunks": len(chunks),
+            "max_segment_length": max_segment_length,
+            "parse_time_seconds": round(parse_time, 2),
+            "file_size": format_file_size(actual_size),
         }
-        json_output = json.dumps(json_result, ensure_ascii=False, indent=2)
+        json_output, full_json = serialize_chunks(summary, chunks)
+        # 完整 JSON 的磁盘写入会释放 GIL，放到后台线程与下面的 HTML 渲染并行
+        file_future = (
+            _FILE_EXECUTOR.submit(write_json_file, full_json) if full_json else None
+        )
 
         progress(0.7, desc="正在生成 Markdown 渲染...")
 
@@ -264,31 +466,25 @@ def split_markdown_formatted(
         """)
 
         # 按类型统计
-        type_counts = {}
-        for chunk in chunks:
-            chunk_type = chunk["type"]
-            type_counts[chunk_type] = type_counts.get(chunk_type, 0) + 1
+        type_counts = Counter(chunk["type"] for chunk in chunks)
 
         html_parts.append(
             "<div style='margin-bottom: 15px;'><strong>📊 分块类型统计:</strong> "
         )
         for chunk_type, count in sorted(type_counts.items()):
-            style = get_chunk_style(chunk_type)
-            html_parts.append(f"""
-            <span style="background: {style["bg"]}; border: 1px solid {style["border"]}; padding: 4px 12px; border-radius: 15px; margin-right: 8px; font-size: 12px; color: {style["text"]}; font-weight: bold;">
-                {format_chunk_type(chunk_type)}: {count}
-            </span>
-            """)
+            template = _TYPE_BADGE_TEMPLATES.get(chunk_type)
+            if template is None:
+                template = _build_type_badge_template(
+                    chunk_type, get_chunk_style(chunk_type)
+                )
+            html_parts.append(template.format(count=count))
         html_parts.append("</div>")
 
-        # 限制显示的分块数量
-        display_chunks = chunks[:MAX_PREVIEW_CHUNKS]
-
         if len(chunks) > MAX_PREVIEW_CHUNKS:
             html_parts.append(f"""
             <div style="background: #fff3cd; border-left: 4px solid #ffc107; padding: 12px 15px; margin-bottom: 20px; border-radius: 5px; color: #856404;">
                 <strong>⚠️ 注意:</strong> 分块数量过多（共 {len(chunks)} 个），仅显示前 {MAX_PREVIEW_CHUNKS} 个分块。
-                完整数据请查看 JSON 格式结果。
+                完整数据请在「JSON 数据」页下载 JSON 文件。
             </div>
             """)
 
@@ -297,88 +493,55 @@ def split_markdown_formatted(
             "<div style='display: flex; flex-direction: column; gap: 12px;'>"
         )
 
-        for i, chunk in enumerate(display_chunks):
-            style = get_chunk_style(chunk["type"])
-
-            # 分块标签信息
-            chunk_info = f"""
-            <div style="
-                display: flex;
-                align-items: center;
-                gap: 8px;
-                padding: 6px 12px;
-                background: {style["bg"]};
-                border: 1px solid {style["border"]};
-                border-radius: 6px 6px 0 0;
-                border-bottom: none;
-                font-size: 11px;
-                color: {style["text"]};
-                font-weight: 500;
-            ">
-                <span style="background: {style["border"]}; color: white; padding: 2px 8px; border-radius: 8px; font-weight: bold;">
-                    #{chunk["id"]}
-                </span>
-                <span>{format_chunk_type(chunk["type"])}</span>
-                <span style="opacity: 0.7;">|</span>
-                <span>层级: {chunk["level"]}</span>
-                <span style="opacity: 0.7;">|</span>
-                <span>父级: {chunk["pids"][-1] if chunk["pids"] else "无"}</span>
-            </div>
-            """
-
-            # 分块内容（转换为 HTML 预览）
-            content_html = markdown_to_html_preview(chunk["content"])
-
-            # 分块容器
-            html_parts.append(f"""
-            <div style="
-                margin-bottom: 20px;
-                border: 2px solid {style["border"]};
-                border-radius: 0 6px 6px 6px;
-                overflow: hidden;
-                background: white;
-                transition: all 0.2s ease;
-                box-shadow: 0 1px 3px rgba(0,0,0,0.05);
-            " onmouseover="this.style.boxShadow='0 4px 8px rgba(0,0,0,0.1)'; this.style.borderColor='{style["hover"]}'"
-               onmouseout="this.style.boxShadow='0 1px 3px rgba(0,0,0,0.05)'; this.style.borderColor='{style["border"]}'">
-                {chunk_info}
-                <div style="
-                    padding: 16px;
-                    background: {style["bg"]};
-                    border-top: 1px solid {style["border"]};
-                    line-height: 1.8;
-                    color: #333;
-                ">
-                    {content_html}
-                </div>
-            </div>
-            """)
+        # 限制显示的分块数量（islice 避免复制列表）
+        for chunk in islice(chunks, MAX_PREVIEW_CHUNKS):
+            chunk_type = chunk["type"]
+            fragments = _CHUNK_FRAGMENTS.get(chunk_type)
+            if fragments is None:
+                fragments = _build_chunk_fragments(get_chunk_style(chunk_type))
+            head, after_id, after_type, after_level, after_parent, tail = fragments
+
+            # 静态片段与动态字段交替追加，最后统一 join
+            html_parts += (
+                head,
+                str(chunk["id"]),
+                after_id,
+                format_chunk_type(chunk_type),
+                after_type,
+                str(chunk["level"]),
+                after_level,
+                str((chunk["pids"] or _NO_PARENT)[-1]),
+                after_parent,
+                # 分块内容（转换为 HTML 预览）
+                markdown_to_html_preview(chunk["content"]),
+                tail,
+            )
 
         html_parts.append("</div>")
 
+        json_file = file_future.result() if file_future else None
+
         progress(1.0, desc="完成！")
 
-        return md_content, json_output, "".join(html_parts)
+        return md_content, json_output, "".join(html_parts), json_file
 
     except Exception as e:
         error_msg = f"处理出错: {str(e)}"
-        import traceback
-
-        traceback.print_exc()
-        return (
-            f"读取文件失败: {error_msg}",
-            json.dumps(
-                {"error": error_msg, "traceback": traceback.format_exc()},
-                ensure_ascii=False,
-                indent=2,
-            ),
-            f'<div style="color: #d32f2f; padding: 20px; background: #ffebee; border-radius: 5px; border-left: 4px solid #d32f2f;">{escape_html(error_msg)}</div>',
-        )
+        # traceback 只格式化一次：总是输出到 stderr，仅调试模式下返回给前端
+        tb = traceback.format_exc()
+        sys.stderr.write(tb)
+        error_payload = {"error": error_msg}
+        if DEBUG:
+            error_payload["traceback"] = tb
+        return _error_outputs(error_msg, error_payload)
 
 
-def clear_all() -> tuple[None, str, str]:
+def clear_all() -> tuple[None, str, str, None]:
     """清空所有内容"""
-    return None, "", ""
+    # 同时释放分块预览的渲染缓存与切分结果缓存
+    markdown_to_html_preview.cache_clear()
+    clear_split_cache()
+    return None, "", "", None
 
 
 # 自定义 CSS 样式
@@ -448,6 +611,7 @@ with gr.Blocks(
     theme=gr.themes.Soft(),
     css=custom_css,
     analytics_enabled=False,
+    delete_cache=_GRADIO_DELETE_CACHE,
 ) as demo:
     gr.Markdown("# 📄 Markdown 文档切分测试工具")
     gr.Markdown(
@@ -496,15 +660,7 @@ with gr.Blocks(
     with gr.Row():
         with gr.Column():
             gr.Markdown("### 🎨 分块类型颜色图例")
-            color_legend_html = ""
-            for chunk_type, style in CHUNK_COLORS.items():
-                color_legend_html += f"""
-                <div class="color-legend-item" style="background: {style["bg"]}; border: 1px solid {style["border"]}; color: {style["text"]};">
-                    <div class="color-box" style="background: {style["bg"]}; border-color: {style["border"]};"></div>
-                    <span style="font-weight: 500;">{format_chunk_type(chunk_type)}</span>
-                </div>
-                """
-            gr.HTML(color_legend_html)
+            gr.HTML(COLOR_LEGEND_HTML)
 
     gr.Markdown("---")
 
@@ -538,15 +694,22 @@ with gr.Blocks(
                         show_label=False,
                         interactive=False,
                     )
+                    json_download = gr.File(
+                        label=f"完整 JSON 下载（分块超过 {MAX_PREVIEW_CHUNKS} 个时提供）",
+                        interactive=False,
+                    )
 
     # 事件绑定
     process_btn.click(
         fn=split_markdown_formatted,
         inputs=[file_input, max_segment_length, heading_level_limit],
-        outputs=[original_output, json_output, render_output],
+        outputs=[original_output, json_output, render_output, json_download],
     )
 
-    clear_btn.click(fn=clear_all, outputs=[file_input, json_output, render_output])
+    clear_btn.click(
+        fn=clear_all,
+        outputs=[file_input, json_output, render_output, json_download],
+    )
 
     # 示例说明
     gr.Markdown("---")
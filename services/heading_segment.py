@@ -1,6 +1,7 @@
 import re
-from dataclasses import asdict, dataclass, field
-from typing import Any, Dict, List, Optional, Pattern
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Pattern, Tuple
 
 from markdown_it import MarkdownIt
 from markdown_it.token import Token
@@ -19,21 +20,9 @@ class ChunkType:
     HTML_CODE = "html_code"
 
 
-@dataclass
-class Chunk:
-    id: int
-    pids: List[int]
-    level: int
-    content: str
-    type: str
-    headers: List[str]
-    meta: Dict[str, Any] = field(default_factory=dict)
-
-    def to_dict(self) -> Dict[str, Any]:
-        return asdict(self)
-
-
 class SectionNode:
+    __slots__ = ("level", "raw_title", "tokens", "children", "parent")
+
     def __init__(self, level: int, raw_title: str):
         self.level = level
         self.raw_title = raw_title
@@ -42,68 +31,180 @@ class SectionNode:
         self.parent: Optional["SectionNode"] = None
 
 
+# ==================== 正则模式 ====================
+# 模块级编译一次，所有 HeadingSegmenter 实例共享
+
+_NEWLINE_RE: Pattern = re.compile(r"\r\n?|\n")
+# 与 str.splitlines(keepends=True) 相同的行边界（含 \f、\v、\x85、U+2028 等），保留行尾分隔符
+_LINE_RE: Pattern = re.compile(
+    r"[^\n\r\v\f\x1c-\x1e\x85\u2028\u2029]*"
+    r"(?:\r\n|[\n\r\v\f\x1c-\x1e\x85\u2028\u2029])?"
+)
+_SENTENCE_RE: Pattern = re.compile(r"[。？！.?!]")
+_HTML_IMG_RE: Pattern = re.compile(
+    r'<img\s+[^>]*?src=["\'](.*?)["\'][^>]*?>', re.IGNORECASE
+)
+_HTML_TABLE_RE: Pattern = re.compile(r"<table[\s\S]*?</table>", re.IGNORECASE)
+_HTML_PRE_RE: Pattern = re.compile(r"<pre[\s\S]*?</pre>", re.IGNORECASE)
+# 上面三个模式的合并前置过滤：未命中则必然不是图片/表格/代码 HTML 块
+_HTML_ANY_RE: Pattern = re.compile(r"<(?:img\s|table|pre)", re.IGNORECASE)
+# 【修复关键】：宽松的正则兜底，用于匹配标准解析器无法识别的“坏”URL（如含空格、括号）
+# 匹配逻辑：![...](...)，URL 不跨行，允许一层成对括号（如 img (1).png），
+# 遇到未配对的右括号即结束，因此同一行的多张图片会分别匹配；模式为线性，无回溯爆炸
+_FALLBACK_IMG_RE: Pattern = re.compile(r"!\[([^\]]*)\]\(((?:[^()\n]|\([^()\n]*\))*)\)")
+
+# 标题标签到层级的查表，省去 int(tag[1:]) 的切片与转换
+_HEADING_LEVEL: Dict[str, int] = {f"h{i}": i for i in range(1, 7)}
+
+# 切分结果缓存：只缓存不超过该长度（字符数）的文档，且最多保留少量条目，
+# 缓存会同时持有原文与分块（约再一份原文），需限制其常驻内存
+_SPLIT_CACHE_MAX_TEXT_LENGTH = 256 * 1024
+_SPLIT_CACHE_SIZE = 16
+
+# 共享的 Markdown 解析器：规则链只构建一次，parse 时每次新建状态，可被多个实例复用
+_MD_PARSER = MarkdownIt("commonmark", {"breaks": True, "html": True})
+
+# 实例上可被调用方替换的属性及其模块默认值；任一被替换则结果可能不同，不走切分缓存
+_CACHE_SAFE_DEFAULTS: Tuple[Tuple[str, Any], ...] = (
+    ("md", _MD_PARSER),
+    ("newline_pattern", _NEWLINE_RE),
+    ("line_pattern", _LINE_RE),
+    ("sentence_split_pattern", _SENTENCE_RE),
+    ("html_img_pattern", _HTML_IMG_RE),
+    ("html_table_pattern", _HTML_TABLE_RE),
+    ("html_pre_pattern", _HTML_PRE_RE),
+    ("html_any_pattern", _HTML_ANY_RE),
+    ("fallback_md_image_pattern", _FALLBACK_IMG_RE),
+)
+
+
 # ==================== 核心工具类 ====================
 
 
 class HeadingSegmenter:
     def __init__(self, max_segment_length: int = 500, heading_level_limit: int = 6):
-        self.md = MarkdownIt("commonmark", {"breaks": True, "html": True})
+        self.md = _MD_PARSER
         self.max_segment_length = max_segment_length
         self.heading_level_limit = heading_level_limit
         self.current_id = 1
 
-        self.sentence_split_pattern: Pattern = re.compile(r"([。？！.?!])")
-        self.html_img_pattern: Pattern = re.compile(
-            r'<img\s+[^>]*?src=["\'](.*?)["\'][^>]*?>', re.IGNORECASE
-        )
-        self.html_table_pattern: Pattern = re.compile(
-            r"<table[\s\S]*?</table>", re.IGNORECASE
-        )
-        self.html_pre_pattern: Pattern = re.compile(
-            r"<pre[\s\S]*?</pre>", re.IGNORECASE
-        )
+        # 当前切分文档（换行已统一为 \n）及每行起始偏移，由 split 设置
+        self.source_text = ""
+        self.line_offsets: List[int] = [0]
 
-        # 【修复关键】：宽松的正则兜底，用于匹配标准解析器无法识别的“坏”URL（如包含不平衡括号）
-        # 匹配逻辑：![...](...)，尽量匹配到行尾的右括号
-        self.fallback_md_image_pattern = re.compile(r"!\[([^\]]*)\]\((.*)\)")
+        self.newline_pattern: Pattern = _NEWLINE_RE
+        self.line_pattern: Pattern = _LINE_RE
+        self.sentence_split_pattern: Pattern = _SENTENCE_RE
+        self.html_img_pattern: Pattern = _HTML_IMG_RE
+        self.html_table_pattern: Pattern = _HTML_TABLE_RE
+        self.html_pre_pattern: Pattern = _HTML_PRE_RE
+        self.html_any_pattern: Pattern = _HTML_ANY_RE
+        self.fallback_md_image_pattern: Pattern = _FALLBACK_IMG_RE
 
     def split(self, markdown_text: str) -> List[Dict[str, Any]]:
+        """切分文档，返回的分块数据归调用方所有，可自由修改"""
         if not markdown_text:
             return []
-        tokens = self.md.parse(markdown_text)
-        source_lines = markdown_text.splitlines()
-        root = self._build_section_tree(tokens, source_lines)
-        chunks = []
-        if root.tokens:
-            self._process_section_content(root, [], [], chunks, source_lines)
-        for child in root.children:
-            self._process_node_recursively(child, [], [], chunks, source_lines)
-        return [c.to_dict() for c in chunks]
-
-    def _build_section_tree(
-        self, tokens: List[Token], source_lines: List[str]
-    ) -> SectionNode:
+        # id 从 1 开始、未经定制的新实例走缓存；复用的实例需接续已有 id，
+        # 子类或替换过解析器/正则的实例结果可能不同，大文档不缓存，均直接计算
+        if (
+            self.current_id == 1
+            and len(markdown_text) <= _SPLIT_CACHE_MAX_TEXT_LENGTH
+            and self._is_cacheable()
+        ):
+            chunks, self.current_id = _cached_split(
+                markdown_text, self.max_segment_length, self.heading_level_limit
+            )
+            # 缓存中的分块为所有调用方共享，逐块复制可变字段后再交给调用方
+            return [
+                {
+                    **c,
+                    "pids": list(c["pids"]),
+                    "headers": list(c["headers"]),
+                    "meta": dict(c["meta"]),
+                }
+                for c in chunks
+            ]
+        return self._split(markdown_text)
+
+    def _is_cacheable(self) -> bool:
+        """是否为未经定制的基础实例，其结果与全新实例一致，可共享缓存"""
+        return type(self) is HeadingSegmenter and all(
+            getattr(self, name) is default for name, default in _CACHE_SAFE_DEFAULTS
+        )
+
+    def _split(self, markdown_text: str) -> List[Dict[str, Any]]:
+        # 与 markdown-it 一致地统一换行，token.map 的行号即对应这里的行；
+        # 仅含 \n 的文档（常见情况）无需替换，避免整篇复制
+        text = markdown_text
+        if "\r" in text:
+            text = self.newline_pattern.sub("\n", text)
+        tokens = self.md.parse(text)
+        self._index_lines(text)
+        try:
+            root = self._build_section_tree(tokens)
+            chunks: List[Dict[str, Any]] = []
+            if root.tokens:
+                self._process_section_content(root, (), (), chunks)
+            # 显式栈做先序深度优先遍历，子节点逆序入栈以保持原有顺序
+            stack = [(child, (), ()) for child in reversed(root.children)]
+            while stack:
+                node, parent_pids, parent_headers = stack.pop()
+                current_headers = parent_headers + (node.raw_title,)
+                header_id = self.current_id
+                self.current_id += 1
+                self._add_chunk(
+                    chunks,
+                    header_id,
+                    parent_pids,
+                    node.level,
+                    node.raw_title,
+                    ChunkType.HEADER,
+                    parent_headers,
+                )
+                current_pids = parent_pids + (header_id,)
+                if node.tokens:
+                    self._process_section_content(
+                        node, current_pids, current_headers, chunks
+                    )
+                stack.extend(
+                    (child, current_pids, current_headers)
+                    for child in reversed(node.children)
+                )
+            return chunks
+        finally:
+            # 释放对整篇文档的引用，复用的实例不会在 split 返回后继续持有上一份文档
+            self.source_text = ""
+            self.line_offsets = [0]
+
+    def _build_section_tree(self, tokens: List[Token]) -> SectionNode:
         root = SectionNode(level=0, raw_title="")
         current_node = root
+        # 按层级索引的祖先栈：stack[k] 为当前路径上层级为 k 的节点，找父节点无需逐级上溯
+        stack: List[Optional[SectionNode]] = [root] + [None] * 6
         i = 0
         while i < len(tokens):
             token = tokens[i]
             if token.type == "heading_open":
-                level = int(token.tag[1:])
-                if level <= self.heading_level_limit:
-                    raw_title = self._get_source_content(token, source_lines) or ""
+                level = _HEADING_LEVEL.get(token.tag, 0)
+                if 0 < level <= self.heading_level_limit:
+                    raw_title = self._get_source_content(token) or ""
                     if not raw_title:
                         inline_content = (
                             tokens[i + 1].content if i + 1 < len(tokens) else ""
                         )
                         raw_title = f"{'#' * level} {inline_content}"
                     new_node = SectionNode(level, raw_title)
-                    while (
-                        current_node.level >= level and current_node.parent is not None
-                    ):
-                        current_node = current_node.parent
-                    new_node.parent = current_node
-                    current_node.children.append(new_node)
+                    parent = next(
+                        stack[k]
+                        for k in range(level - 1, -1, -1)
+                        if stack[k] is not None
+                    )
+                    new_node.parent = parent
+                    parent.children.append(new_node)
+                    stack[level] = new_node
+                    for k in range(level + 1, 7):
+                        stack[k] = None
                     current_node = new_node
                     while i < len(tokens) and tokens[i].type != "heading_close":
                         i += 1
@@ -114,54 +215,26 @@ class HeadingSegmenter:
             i += 1
         return root
 
-    def _process_node_recursively(
-        self,
-        node: SectionNode,
-        parent_pids: List[int],
-        parent_headers: List[str],
-        chunks: List[Chunk],
-        source_lines: List[str],
-    ) -> None:
-        current_headers = parent_headers + [node.raw_title]
-        header_id = self.current_id
-        self.current_id += 1
-        self._add_chunk(
-            chunks,
-            header_id,
-            parent_pids,
-            node.level,
-            node.raw_title,
-            ChunkType.HEADER,
-            parent_headers,
-        )
-        current_pids = parent_pids + [header_id]
-        if node.tokens:
-            self._process_section_content(
-                node, current_pids, current_headers, chunks, source_lines
-            )
-        for child in node.children:
-            self._process_node_recursively(
-                child, current_pids, current_headers, chunks, source_lines
-            )
-
     def _process_section_content(
         self,
         node: SectionNode,
-        pids: List[int],
-        headers: List[str],
-        chunks: List[Chunk],
-        source_lines: List[str],
+        pids: Tuple[int, ...],
+        headers: Tuple[str, ...],
+        chunks: List[Dict[str, Any]],
     ) -> None:
         tokens = node.tokens
         level = node.level
         text_buffer: List[str] = []
+        close_of = self._index_closing_tokens(tokens)
+        # 热循环中的方法查找提前绑定为局部变量；current_id 会被下层辅助方法推进，仍直接读写
+        add = self._add_chunk
         i = 0
         while i < len(tokens):
             token = tokens[i]
             if token.type in ("fence", "code_block"):
                 self._flush_text_buffer(text_buffer, pids, level, headers, chunks)
-                content = self._get_source_content(token, source_lines) or token.content
-                self._add_chunk(
+                content = self._get_source_content(token) or token.content
+                add(
                     chunks,
                     self.current_id,
                     pids,
@@ -173,11 +246,9 @@ class HeadingSegmenter:
                 self.current_id += 1
             elif token.type == "table_open":
                 self._flush_text_buffer(text_buffer, pids, level, headers, chunks)
-                close_idx = self._find_closing_token_index(tokens, i, "table_close")
-                content = (
-                    self._get_source_content(token, source_lines) or "<table markdown>"
-                )
-                self._add_chunk(
+                close_idx = close_of.get(i, i)
+                content = self._get_source_content(token) or "<table markdown>"
+                add(
                     chunks,
                     self.current_id,
                     pids,
@@ -190,13 +261,23 @@ class HeadingSegmenter:
                 i = close_idx
             elif token.type == "html_block":
                 content = token.content
-                if (
-                    self.html_img_pattern.search(content)
-                    or self.html_table_pattern.search(content)
-                    or self.html_pre_pattern.search(content)
-                ):
+                type_str = ChunkType.TEXT
+                meta = {}
+                if "<" in content and self.html_any_pattern.search(content):
+                    type_str, meta = self._classify_html_block(content)
+                if type_str != ChunkType.TEXT:
                     self._flush_text_buffer(text_buffer, pids, level, headers, chunks)
-                    self._handle_html_block(content, pids, level, headers, chunks)
+                    add(
+                        chunks,
+                        self.current_id,
+                        pids,
+                        level,
+                        content,
+                        type_str,
+                        headers,
+                        meta,
+                    )
+                    self.current_id += 1
                 else:
                     text_buffer.append(content)
             elif token.type in (
@@ -206,31 +287,38 @@ class HeadingSegmenter:
                 "blockquote_open",
                 "heading_open",
             ):
-                close_type = token.type.replace("_open", "_close")
-                close_idx = self._find_closing_token_index(tokens, i, close_type)
-                block_content = self._get_source_content(token, source_lines)
+                close_idx = close_of.get(i, i)
+                block_content = self._get_source_content(token)
                 if block_content:
-                    # 1. 检查标准 Token 图片
-                    inline_tokens = [
-                        t for t in tokens[i + 1 : close_idx] if t.type == "inline"
-                    ]
-                    has_standard_image = False
-                    for t in inline_tokens:
-                        if t.children and any(c.type == "image" for c in t.children):
-                            has_standard_image = True
-                            break
-
-                    # 2. 检查不规范图片 (正则兜底)
-                    has_broken_image = self.fallback_md_image_pattern.search(
-                        block_content
+                    # 1. 检查标准 Token 图片（一次遍历直接收集图片 token）
+                    image_tokens: List[Token] = []
+                    for j in range(i + 1, close_idx):
+                        t = tokens[j]
+                        if t.type == "inline" and t.children:
+                            image_tokens.extend(
+                                c for c in t.children if c.type == "image"
+                            )
+
+                    # 2. 检查不规范图片 (正则兜底)，匹配结果直接交给切分逻辑复用
+                    # 先做子串预判，绝大多数不含 "![" 的块无需进入正则
+                    fallback_matches = (
+                        list(self.fallback_md_image_pattern.finditer(block_content))
+                        if "![" in block_content
+                        else []
                     )
 
-                    if has_standard_image or has_broken_image:
+                    if image_tokens or fallback_matches:
                         self._flush_text_buffer(
                             text_buffer, pids, level, headers, chunks
                         )
                         self._handle_mixed_content_robust(
-                            block_content, inline_tokens, pids, level, headers, chunks
+                            block_content,
+                            image_tokens,
+                            fallback_matches,
+                            pids,
+                            level,
+                            headers,
+                            chunks,
                         )
                     else:
                         text_buffer.append(block_content)
@@ -239,58 +327,70 @@ class HeadingSegmenter:
         self._flush_text_buffer(text_buffer, pids, level, headers, chunks)
 
     def _handle_mixed_content_robust(
-        self, block_text: str, inline_tokens: List[Token], pids, level, headers, chunks
+        self,
+        block_text: str,
+        image_tokens: List[Token],
+        fallback_matches: List[re.Match],
+        pids,
+        level,
+        headers,
+        chunks,
     ):
         """
         增强版混合内容切分：结合 Token 定位和正则兜底
         """
         image_spans = []  # 存储 (start, end, content, meta)
 
+        # 按 src 索引正则已找到的图片位置，标准图片优先直接按 src 取位置
+        spans_by_src: Dict[str, List[re.Match]] = defaultdict(list)
+        for match in fallback_matches:
+            spans_by_src[match.group(2).strip()].append(match)
+
         # A. Token 方式提取 (标准 Markdown 图片)
-        for t in inline_tokens:
-            if not t.children:
+        for child in image_tokens:
+            attrs = child.attrs if child.attrs is not None else {}
+            src_raw = attrs.get("src", "")
+            src = str(src_raw) if src_raw is not None else ""
+
+            alt_raw = child.content
+            alt = str(alt_raw) if alt_raw is not None else ""
+
+            if not src:
+                continue  # 跳过无链接图片
+
+            candidates = spans_by_src.get(src)
+            if candidates:
+                match = candidates.pop(0)
+                meta = {"url": src, "alt": alt}
+                image_spans.append((match.start(), match.end(), match.group(0), meta))
                 continue
-            for child in t.children:
-                if child.type == "image":
-                    attrs = child.attrs if child.attrs is not None else {}
-                    src_raw = attrs.get("src", "")
-                    src = str(src_raw) if src_raw is not None else ""
-
-                    alt_raw = child.content
-                    alt = str(alt_raw) if alt_raw is not None else ""
-
-                    if not src:
-                        continue  # 跳过无链接图片
-
-                    # 在源码中定位 src
-                    search_start = 0
-                    while True:
-                        src_idx = block_text.find(src, search_start)
-                        if src_idx == -1:
-                            break
-
-                        # 简单验证前面是否有 ](
-                        if (
-                            src_idx >= 2
-                            and block_text[src_idx - 2 : src_idx].strip() == "]("
-                        ):
-                            # 向后找右括号
-                            end_paren = block_text.find(")", src_idx + len(src))
-                            # 向前找左侧 ![
-                            start_bracket = block_text.rfind("![", 0, src_idx)
-
-                            if end_paren != -1 and start_bracket != -1:
-                                full_img_str = block_text[start_bracket : end_paren + 1]
-                                meta = {"url": src, "alt": alt}
-                                image_spans.append(
-                                    (start_bracket, end_paren + 1, full_img_str, meta)
-                                )
-                                search_start = end_paren + 1
-                                continue
-                        search_start = src_idx + 1
+
+            # 索引未命中（如 URL 含括号或带 title）时，在源码中定位 src
+            search_start = 0
+            while True:
+                src_idx = block_text.find(src, search_start)
+                if src_idx == -1:
+                    break
+
+                # 简单验证前面是否有 ](
+                if src_idx >= 2 and block_text[src_idx - 2 : src_idx] == "](":
+                    # 向后找右括号
+                    end_paren = block_text.find(")", src_idx + len(src))
+                    # 向前找左侧 ![
+                    start_bracket = block_text.rfind("![", 0, src_idx)
+
+                    if end_paren != -1 and start_bracket != -1:
+                        full_img_str = block_text[start_bracket : end_paren + 1]
+                        meta = {"url": src, "alt": alt}
+                        image_spans.append(
+                            (start_bracket, end_paren + 1, full_img_str, meta)
+                        )
+                        search_start = end_paren + 1
+                        continue
+                search_start = src_idx + 1
 
         # B. 正则兜底提取 (针对 markdown-it 无法识别的损坏图片)
-        for match in self.fallback_md_image_pattern.finditer(block_text):
+        for match in fallback_matches:
             start, end = match.span()
 
             # 检查是否与 Token 识别的图片重叠，避免重复
@@ -312,15 +412,15 @@ class HeadingSegmenter:
         # C. 按位置切分
         image_spans.sort(key=lambda x: x[0])
 
+        add = self._add_chunk
+        split_text = self._handle_text_splitting_hierarchical
         cursor = 0
         for start, end, img_content, meta in image_spans:
             if start > cursor:
                 pre_text = block_text[cursor:start]
-                self._handle_text_splitting_hierarchical(
-                    pre_text, pids, level, headers, chunks
-                )
+                split_text(pre_text, pids, level, headers, chunks)
 
-            self._add_chunk(
+            add(
                 chunks,
                 self.current_id,
                 pids,
@@ -335,9 +435,7 @@ class HeadingSegmenter:
 
         if cursor < len(block_text):
             remaining_text = block_text[cursor:]
-            self._handle_text_splitting_hierarchical(
-                remaining_text, pids, level, headers, chunks
-            )
+            split_text(remaining_text, pids, level, headers, chunks)
 
     def _flush_text_buffer(self, buffer: List[str], pids, level, headers, chunks):
         if not buffer:
@@ -351,179 +449,201 @@ class HeadingSegmenter:
     def _handle_text_splitting_hierarchical(
         self,
         text: str,
-        pids: List[int],
+        pids: Tuple[int, ...],
         level: int,
-        headers: List[str],
-        chunks: List[Chunk],
+        headers: Tuple[str, ...],
+        chunks: List[Dict[str, Any]],
     ):
-        if not text.strip():
+        # isspace 判空不分配新字符串，strip 只留给真正输出的分块
+        if not text or text.isspace():
             return
-        if len(text) <= self.max_segment_length:
-            self._add_chunk(
-                chunks,
-                self.current_id,
-                pids,
-                level,
-                text.strip(),
-                ChunkType.TEXT,
-                headers,
-            )
-            self.current_id += 1
+        # 热路径局部变量：避免每个分块都做属性查找，结束时写回 current_id
+        add = self._add_chunk
+        max_len = self.max_segment_length
+        text_type = ChunkType.TEXT
+        cid = self.current_id
+        if len(text) <= max_len:
+            add(chunks, cid, pids, level, text.strip(), text_type, headers)
+            self.current_id = cid + 1
             return
-        lines = text.splitlines(keepends=True)
-        current_buffer = ""
-        for line in lines:
-            if len(current_buffer) + len(line) > self.max_segment_length:
-                if current_buffer:
-                    self._add_chunk(
+        # 逐行流式读取（保留换行符），行先放入列表，输出分块时再统一 join
+        current_lines: List[str] = []
+        current_length = 0
+        for match in self.line_pattern.finditer(text):
+            line = match.group()
+            if not line:
+                continue
+            if current_length + len(line) > max_len:
+                if current_lines:
+                    add(
                         chunks,
-                        self.current_id,
+                        cid,
                         pids,
                         level,
-                        current_buffer.strip(),
-                        ChunkType.TEXT,
+                        "".join(current_lines).strip(),
+                        text_type,
                         headers,
                     )
-                    self.current_id += 1
-                    current_buffer = ""
-                if len(line) > self.max_segment_length:
+                    cid += 1
+                    current_lines = []
+                    current_length = 0
+                if len(line) > max_len:
+                    # 句子切分会推进 current_id，调用前后同步局部计数
+                    self.current_id = cid
                     self._handle_sentence_splitting(line, pids, level, headers, chunks)
+                    cid = self.current_id
                 else:
-                    current_buffer = line
+                    current_lines.append(line)
+                    current_length = len(line)
             else:
-                current_buffer += line
-        if current_buffer:
-            self._add_chunk(
+                current_lines.append(line)
+                current_length += len(line)
+        if current_lines:
+            add(
                 chunks,
-                self.current_id,
+                cid,
                 pids,
                 level,
-                current_buffer.strip(),
-                ChunkType.TEXT,
+                "".join(current_lines).strip(),
+                text_type,
                 headers,
             )
-            self.current_id += 1
+            cid += 1
+        self.current_id = cid
 
     def _handle_sentence_splitting(
         self,
         text: str,
-        pids: List[int],
+        pids: Tuple[int, ...],
         level: int,
-        headers: List[str],
-        chunks: List[Chunk],
+        headers: Tuple[str, ...],
+        chunks: List[Dict[str, Any]],
     ):
-        parts = self.sentence_split_pattern.split(text)
+        add = self._add_chunk
+        max_len = self.max_segment_length
+        text_type = ChunkType.TEXT
+        cid = self.current_id
         current_chunk_text = ""
-        i = 0
-        while i < len(parts):
-            part = parts[i]
-            sep = parts[i + 1] if i + 1 < len(parts) else ""
-            segment = part + sep
-            if len(current_chunk_text) + len(segment) > self.max_segment_length:
+        for segment in self._iter_sentences(text):
+            if len(current_chunk_text) + len(segment) > max_len:
                 if current_chunk_text:
-                    self._add_chunk(
+                    add(
                         chunks,
-                        self.current_id,
+                        cid,
                         pids,
                         level,
                         current_chunk_text.strip(),
-                        ChunkType.TEXT,
+                        text_type,
                         headers,
                     )
-                    self.current_id += 1
+                    cid += 1
                     current_chunk_text = ""
-                if len(segment) > self.max_segment_length:
-                    self._add_chunk(
-                        chunks,
-                        self.current_id,
-                        pids,
-                        level,
-                        segment.strip(),
-                        ChunkType.TEXT,
-                        headers,
-                    )
-                    self.current_id += 1
+                if len(segment) > max_len:
+                    add(chunks, cid, pids, level, segment.strip(), text_type, headers)
+                    cid += 1
                 else:
                     current_chunk_text = segment
             else:
                 current_chunk_text += segment
-            i += 2
         if current_chunk_text:
-            self._add_chunk(
+            add(
                 chunks,
-                self.current_id,
+                cid,
                 pids,
                 level,
                 current_chunk_text.strip(),
-                ChunkType.TEXT,
+                text_type,
                 headers,
             )
-            self.current_id += 1
-
-    def _handle_html_block(
-        self,
-        content: str,
-        pids: List[int],
-        level: int,
-        headers: List[str],
-        chunks: List[Chunk],
-    ):
-        type_str = ChunkType.TEXT
-        meta = {}
-        if self.html_img_pattern.search(content):
-            type_str = ChunkType.HTML_IMAGE
-            match = self.html_img_pattern.search(content)
-            if match:
-                meta = {"url": match.group(1), "alt": ""}
-        elif self.html_table_pattern.search(content):
-            type_str = ChunkType.HTML_TABLE
-        elif self.html_pre_pattern.search(content):
-            type_str = ChunkType.HTML_CODE
-
-        if type_str != ChunkType.TEXT:
-            self._add_chunk(
-                chunks, self.current_id, pids, level, content, type_str, headers, meta
-            )
-            self.current_id += 1
-        else:
-            self._handle_text_splitting_hierarchical(
-                content, pids, level, headers, chunks
-            )
-
-    def _get_source_content(
-        self, token: Token, source_lines: List[str]
-    ) -> Optional[str]:
+            cid += 1
+        self.current_id = cid
+
+    def _iter_sentences(self, text: str) -> Iterator[str]:
+        """按句末标点切句（标点保留在句尾），直接切片而不生成中间列表"""
+        prev = 0
+        for match in self.sentence_split_pattern.finditer(text):
+            end = match.end()
+            yield text[prev:end]
+            prev = end
+        if prev < len(text):
+            yield text[prev:]
+
+    def _classify_html_block(self, content: str) -> Tuple[str, Dict[str, Any]]:
+        """判断 HTML 块的类型，每个模式只匹配一次"""
+        match = self.html_img_pattern.search(content)
+        if match:
+            return ChunkType.HTML_IMAGE, {"url": match.group(1), "alt": ""}
+        if self.html_table_pattern.search(content):
+            return ChunkType.HTML_TABLE, {}
+        if self.html_pre_pattern.search(content):
+            return ChunkType.HTML_CODE, {}
+        return ChunkType.TEXT, {}
+
+    def _index_lines(self, text: str) -> None:
+        """记录文档及每行起始偏移（前缀和），按行号区间取源码只需一次切片"""
+        offsets = [0]
+        offsets.extend(match.end() for match in self.newline_pattern.finditer(text))
+        if not text.endswith("\n"):
+            offsets.append(len(text))
+        self.source_text = text
+        self.line_offsets = offsets
+
+    def _get_source_content(self, token: Token) -> Optional[str]:
         if token.map:
-            return "\n".join(source_lines[token.map[0] : token.map[1]])
+            offsets = self.line_offsets
+            last = len(offsets) - 1
+            start = offsets[min(token.map[0], last)]
+            end = offsets[min(token.map[1], last)]
+            content = self.source_text[start:end]
+            # 去掉末行自带的换行，与按行拼接的结果一致
+            return content[:-1] if content.endswith("\n") else content
         return None
 
-    def _find_closing_token_index(
-        self, tokens: List[Token], start_index: int, close_type: str
-    ) -> int:
-        nesting = 1
-        open_type = close_type.replace("_close", "_open")
-        for j in range(start_index + 1, len(tokens)):
-            if tokens[j].type == open_type:
-                nesting += 1
-            elif tokens[j].type == close_type:
-                nesting -= 1
-            if nesting == 0:
-                return j
-        return start_index
+    def _index_closing_tokens(self, tokens: List[Token]) -> Dict[int, int]:
+        """
+        一次遍历建立 开标签下标 -> 对应闭标签下标 的映射
+        按类型分别维护栈：章节切分后节点内的 token 可能不成对，找不到闭标签的不入表
+        """
+        close_of: Dict[int, int] = {}
+        open_stacks: Dict[str, List[int]] = defaultdict(list)
+        for j, token in enumerate(tokens):
+            if token.nesting == 1:
+                open_stacks[token.type[: -len("_open")]].append(j)
+            elif token.nesting == -1:
+                stack = open_stacks.get(token.type[: -len("_close")])
+                if stack:
+                    close_of[stack.pop()] = j
+        return close_of
 
     def _add_chunk(
         self, chunks, chunk_id, pids, level, content, type_str, headers, meta=None
     ):
-        if type_str == ChunkType.TEXT and not content.strip():
+        if type_str == ChunkType.TEXT and (not content or content.isspace()):
             return
+        # 直接输出字典，pids/headers 由共享元组复制为列表
         chunks.append(
-            Chunk(
-                chunk_id,
-                list(pids),
-                level,
-                content,
-                type_str,
-                list(headers),
-                meta or {},
-            )
+            {
+                "id": chunk_id,
+                "pids": list(pids),
+                "level": level,
+                "content": content,
+                "type": type_str,
+                "headers": list(headers),
+                "meta": meta or {},
+            }
         )
+
+
+@lru_cache(maxsize=_SPLIT_CACHE_SIZE)
+def _cached_split(
+    markdown_text: str, max_segment_length: int, heading_level_limit: int
+) -> Tuple[List[Dict[str, Any]], int]:
+    """以全新实例切分并缓存，返回 (分块列表, 下一个可用 id)"""
+    segmenter = HeadingSegmenter(max_segment_length, heading_level_limit)
+    chunks = segmenter._split(markdown_text)
+    return chunks, segmenter.current_id
+
+
+def clear_split_cache() -> None:
+    """清空切分结果缓存"""
+    _cached_split.cache_clear()